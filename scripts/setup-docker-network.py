@@ -5,17 +5,34 @@ Lima Docker 虚拟机网络配置脚本
 功能：配置Docker网桥、Minikube集群路由、DNS解析和网络转发规则
 """
 
+import asyncio
+import http.client
 import json
 import os
 import re
+import socket
 import subprocess
 import sys
+import threading
 import time
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict
-from functools import lru_cache
+from shutil import which
+from typing import Any, List, Optional, Dict, Tuple
+from urllib.parse import quote
+from functools import lru_cache, partial
+
+try:
+    import orjson  # 可选依赖：更快的 JSON 解析
+except ImportError:
+    orjson = None
+
+try:
+    from kubernetes import client as k8s_client, config as k8s_config  # 可选依赖：进程内访问 API Server
+except ImportError:
+    k8s_client = k8s_config = None
 
 # ==================== 配置常量 ====================
 
@@ -24,8 +41,28 @@ class Config:
     DAEMON_JSON_PATH = Path("/etc/docker/daemon.json")
     DNS_CONF_DIR = Path("/etc/systemd/resolved.conf.d")
     DNS_CONF_FILE = DNS_CONF_DIR / "minikube-dns.conf"
+    IP_FORWARD_PATH = Path("/proc/sys/net/ipv4/ip_forward")
     REQUIRED_COMMANDS = ['docker', 'iptables', 'ip']
     IPTABLES_TABLES = ['filter', 'nat']
+    NETWORK_CACHE_NAME = "docker-net-setup-cache.json"
+    NETWORK_CACHE_TTL = 30  # 秒
+
+# 预编译的正则表达式
+_DEFAULT_DEV_RE = re.compile(r'default.*dev\s+(\S+)')
+_BRIDGE_RE = re.compile(r'br-[a-f0-9]+')
+_IPV4_RE = re.compile(r'^\d+\.\d+\.\d+\.\d+$')
+_APISERVER_CIDR_RE = re.compile(r'service-cluster-ip-range=([0-9./]+)')
+_KUBEADM_CIDR_RE = re.compile(r'serviceSubnet:\s*([0-9./]+)')
+_KUBE_PROXY_CIDR_RE = re.compile(r'clusterCIDR:\s*"?([0-9./]+)"?')
+_DNS_CONF_RE = re.compile(r'^(DNS|Domains)=(.+)$', re.MULTILINE)
+
+# 规则公共尾部（只读，拼接时生成新列表）
+_ACCEPT = ['-j', 'ACCEPT']
+_ACCEPT_ESTAB = ['-m', 'state', '--state', 'RELATED,ESTABLISHED', '-j', 'ACCEPT']
+_MASQUERADE = ['-j', 'MASQUERADE']
+
+# 拓扑图渲染时读取的 DNS 配置路径（模块加载时转换一次）
+_DNS_PATH = str(Config.DNS_CONF_FILE)
 
 # ==================== 日志和命令执行 ====================
 
@@ -71,23 +108,30 @@ class CommandExecutor:
     
     @staticmethod
     def run(cmd: List[str], check: bool = True, capture_output: bool = True, 
-            shell: bool = False, sudo: bool = False) -> subprocess.CompletedProcess:
-        """统一的命令执行接口"""
-        if sudo:
-            if shell:
-                cmd_str = ' '.join(cmd) if isinstance(cmd, list) else cmd
+            shell: bool = False, sudo: bool = False, return_bytes: bool = False,
+            quiet: bool = False) -> subprocess.CompletedProcess:
+        """统一的命令执行接口（return_bytes: 输出不解码；quiet: 丢弃输出，只关心返回码）"""
+        if sudo and shell:
+            cmd_str = ' '.join(cmd) if isinstance(cmd, list) else cmd
+            if os.geteuid() == 0:
+                cmd = cmd_str
+            else:
                 cmd = ['sudo', 'bash', '-c', cmd_str]
                 shell = False
-            else:
-                cmd = ['sudo'] + cmd
+        elif sudo:
+            cmd = CommandExecutor.sudo_prefix(cmd)
         
         if cmd and 'kubectl' in str(cmd[0]):
             shell = True
             cmd = ' '.join(cmd) if isinstance(cmd, list) else cmd
         
+        if quiet:
+            streams = {'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+        else:
+            streams = {'capture_output': capture_output, 'text': not return_bytes}
+        
         try:
-            return subprocess.run(cmd, check=check, capture_output=capture_output, 
-                                text=True, shell=shell)
+            return subprocess.run(cmd, check=check, shell=shell, **streams)
         except subprocess.CalledProcessError as e:
             if check:
                 cmd_str = cmd if isinstance(cmd, str) else ' '.join(cmd)
@@ -98,19 +142,109 @@ class CommandExecutor:
         except OSError as e:
             if e.errno == 8 and not shell:
                 Logger.debug(f"尝试使用 shell 模式: {' '.join(cmd)}")
+                # cmd 已带 sudo 前缀，重试时不再重复添加
                 return CommandExecutor.run(cmd, check=check, capture_output=capture_output, 
-                                         shell=True, sudo=sudo)
+                                         shell=True, return_bytes=return_bytes,
+                                         quiet=quiet)
             raise
     
+    @staticmethod
+    async def run_many_async(cmds: List[List[str]]) -> List[subprocess.CompletedProcess]:
+        """并发执行多条命令，结果顺序与 cmds 一致（输出为 bytes，不检查返回码）"""
+        async def _run(cmd: List[str]) -> subprocess.CompletedProcess:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            except OSError as e:
+                return subprocess.CompletedProcess(cmd, 127, b'', str(e).encode())
+            stdout, stderr = await proc.communicate()
+            return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+        
+        return list(await asyncio.gather(*(_run(cmd) for cmd in cmds)))
+    
+    @staticmethod
+    def sudo_prefix(cmd: List[str]) -> List[str]:
+        """需要提权时加 sudo 前缀（已是 root 时原样返回）"""
+        return cmd if os.geteuid() == 0 else ['sudo'] + cmd
+    
     @staticmethod
     def run_sudo(cmd: List[str], **kwargs) -> subprocess.CompletedProcess:
         """以 sudo 权限执行命令"""
         return CommandExecutor.run(cmd, sudo=True, **kwargs)
     
     @staticmethod
+    @lru_cache(maxsize=32)
     def command_exists(cmd: str) -> bool:
-        """检查命令是否存在"""
-        return subprocess.run(['which', cmd], capture_output=True).returncode == 0
+        """检查命令是否存在（进程内查找 PATH，带缓存）"""
+        return which(cmd) is not None
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """基于 UNIX socket 的 HTTP 连接"""
+    
+    def __init__(self, socket_path: str, timeout: float = 10):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+    
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+class DockerAPI:
+    """Docker Engine API 客户端（直连 daemon socket，免去 docker CLI 进程开销）"""
+    DEFAULT_SOCKET = '/var/run/docker.sock'
+    _conn: Optional[UnixHTTPConnection] = None
+    _lock = threading.Lock()
+    
+    @classmethod
+    def socket_path(cls) -> Optional[str]:
+        """解析 daemon socket 路径，DOCKER_HOST 非 unix:// 时返回 None"""
+        host = os.environ.get('DOCKER_HOST', '')
+        if not host:
+            return cls.DEFAULT_SOCKET
+        if host.startswith('unix://'):
+            return host[len('unix://'):]
+        return None
+    
+    @classmethod
+    def available(cls) -> bool:
+        """socket 可访问时才走 API，否则由调用方回退到 docker CLI"""
+        path = cls.socket_path()
+        return bool(path) and os.access(path, os.R_OK | os.W_OK)
+    
+    @classmethod
+    def request(cls, path: str) -> Tuple[int, bytes]:
+        """发送 GET 请求（复用同一条 keep-alive 连接）"""
+        with cls._lock:
+            if cls._conn is None:
+                cls._conn = UnixHTTPConnection(cls.socket_path())
+            try:
+                cls._conn.request('GET', path)
+                response = cls._conn.getresponse()
+                return response.status, response.read()
+            except (OSError, http.client.HTTPException):
+                cls._conn.close()
+                cls._conn = None
+                raise
+    
+    @classmethod
+    def ping(cls) -> bool:
+        """检查 daemon 是否就绪（GET /_ping）"""
+        try:
+            status, _ = cls.request('/_ping')
+        except (OSError, http.client.HTTPException):
+            return False
+        return status == 200
+    
+    @classmethod
+    def get_json(cls, path: str) -> Optional[Any]:
+        """GET 并解析 JSON，请求失败或非 200 时返回 None"""
+        try:
+            status, body = cls.request(path)
+        except (OSError, http.client.HTTPException) as e:
+            Logger.debug(f"Docker API 请求失败: {path} ({e})")
+            return None
+        return json.loads(body) if status == 200 else None
 
 # ==================== 数据模型 ====================
 
@@ -129,11 +263,42 @@ class MinikubeInfo:
     subnet: str
     service_cidr: Optional[str] = None
 
+@dataclass
+class IptablesSnapshot:
+    """iptables-save 快照（按 表/链 索引）"""
+    rules: Dict[Tuple[str, str], List[bytes]] = field(default_factory=dict)
+    index: Dict[Tuple[str, str], set] = field(default_factory=dict)
+    
+    def contains(self, table: str, chain: str, rule: List[str]) -> bool:
+        """检查规则是否存在"""
+        return IptablesManager._rule_key(rule) in self.index.get((table, chain), ())
+    
+    def list_rules(self, table: str, chain: str) -> List[str]:
+        """列出规则"""
+        return [rule.decode() for rule in self.rules.get((table, chain), [])]
+
 # ==================== Docker 配置管理 ====================
 
 class DockerConfigManager:
     """Docker 配置管理器"""
     
+    @staticmethod
+    def _load_config(path: Path) -> Dict:
+        """读取 daemon.json（优先使用 orjson）"""
+        if orjson is not None:
+            return orjson.loads(path.read_bytes())
+        with open(path, 'r') as f:
+            return json.load(f)
+    
+    @staticmethod
+    def _write_config(path: Path, config: Dict):
+        """写入 daemon.json（优先使用 orjson）"""
+        if orjson is not None:
+            path.write_bytes(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+            return
+        with open(path, 'w') as f:
+            json.dump(config, f, indent=2)
+    
     @classmethod
     def check_and_fix_iptables_config(cls) -> bool:
         """检查并修复 Docker iptables 配置"""
@@ -165,8 +330,7 @@ class DockerConfigManager:
         
         try:
             path.parent.mkdir(parents=True, exist_ok=True)
-            with open(path, 'w') as f:
-                json.dump(config, f, indent=2)
+            cls._write_config(path, config)
             
             CommandExecutor.run_sudo(['chown', 'root:root', str(path)])
             CommandExecutor.run_sudo(['chmod', '644', str(path)])
@@ -181,8 +345,7 @@ class DockerConfigManager:
         """检查并更新配置"""
         path = Config.DAEMON_JSON_PATH
         try:
-            with open(path, 'r') as f:
-                config = json.load(f)
+            config = cls._load_config(path)
             
             if config.get('iptables') is False:
                 Logger.info("✅ Docker iptables 配置正确: iptables = false")
@@ -196,8 +359,7 @@ class DockerConfigManager:
             Logger.info(f"已备份原配置到: {backup_path}")
             
             config['iptables'] = False
-            with open(path, 'w') as f:
-                json.dump(config, f, indent=2)
+            cls._write_config(path, config)
             
             Logger.info("✅ 配置已修改")
             return True
@@ -216,30 +378,37 @@ class DockerConfigManager:
         
         try:
             CommandExecutor.run_sudo(['systemctl', 'restart', 'docker'])
+            NetworkInfoProvider.invalidate_cache()
             Logger.info("✅ Docker 服务重启命令已发出，开始健康检查...")
             
-            # 以更快的轮询替代固定等待，尽快恢复继续执行
-            max_wait_seconds = 10
-            for i in range(max_wait_seconds):
-                result = CommandExecutor.run(['docker', 'ps'], check=False)
-                if result.returncode == 0:
-                    Logger.info("✅ Docker 服务运行正常")
-                    break
-                time.sleep(1)
-            else:
-                Logger.error("❌ Docker 服务启动异常")
-                sys.exit(1)
+            # systemctl restart 会阻塞到服务启动完成，这里只需确认 API 就绪；
+            # 以指数退避探测，通常首次即可成功
+            deadline = time.monotonic() + 10
+            delay = 0.05
+            while not cls._docker_ready():
+                if time.monotonic() >= deadline:
+                    Logger.error("❌ Docker 服务启动异常")
+                    sys.exit(1)
+                time.sleep(delay)
+                delay = min(delay * 2, 1)
+            Logger.info("✅ Docker 服务运行正常")
         except Exception as e:
             Logger.error(f"❌ Docker 服务重启失败: {e}")
             Logger.info("请手动执行: sudo systemctl restart docker")
             sys.exit(1)
     
+    @staticmethod
+    def _docker_ready() -> bool:
+        """检查 Docker daemon 是否可用"""
+        if DockerAPI.socket_path():
+            return DockerAPI.ping()
+        return CommandExecutor.run(['docker', 'ps'], check=False).returncode == 0
+    
     @classmethod
     def _verify_config(cls):
         """验证配置"""
         try:
-            with open(Config.DAEMON_JSON_PATH, 'r') as f:
-                config = json.load(f)
+            config = cls._load_config(Config.DAEMON_JSON_PATH)
             
             if config.get('iptables') is False:
                 Logger.info("✅ Docker iptables 配置验证通过")
@@ -259,131 +428,250 @@ class IptablesManager:
     
     def __init__(self, batch_mode: bool = True):
         self.batch_mode = batch_mode
-        self.rules_to_add = []
+        self.rules_to_add: Dict[str, List[Tuple[str, List[str], Optional[str]]]] = {
+            table: [] for table in Config.IPTABLES_TABLES}
+        self._queued: set = set()
         self._cache = {}
     
     @staticmethod
-    def rule_exists(table: str, chain: str, rule: List[str]) -> bool:
-        """检查规则是否存在"""
-        cmd = ['sudo', 'iptables']
+    def rule_exists(table: str, chain: str, rule: List[str],
+                    snapshot: Optional['IptablesSnapshot'] = None) -> bool:
+        """检查规则是否存在（传入快照时直接查表，不再调用 iptables）"""
+        if snapshot is not None:
+            return snapshot.contains(table, chain, rule)
+        
+        cmd = ['iptables']
         if table != 'filter':
             cmd.extend(['-t', table])
         cmd.extend(['-C', chain] + rule)
-        return subprocess.run(cmd, capture_output=True).returncode == 0
+        return CommandExecutor.run_sudo(cmd, check=False, quiet=True).returncode == 0
     
-    def add_rule(self, table: str, chain: str, rule: List[str]):
-        """添加规则（支持批量模式）"""
+    def add_rule(self, table: str, chain: str, rule: List[str], section: Optional[str] = None):
+        """添加规则（支持批量模式；section 用于提交时按配置步骤统计）"""
         if self.batch_mode:
-            self.rules_to_add.append({'table': table, 'chain': chain, 'rule': rule})
+            # 各配置步骤可能生成相同规则，入队时直接去重
+            key = (table, chain, self._rule_key(rule))
+            if key in self._queued:
+                return
+            self._queued.add(key)
+            self.rules_to_add.setdefault(table, []).append((chain, rule, section))
         else:
             self._execute_rule(table, chain, rule)
     
     def _execute_rule(self, table: str, chain: str, rule: List[str]) -> bool:
         """立即执行单条规则"""
-        if self.rule_exists(table, chain, rule):
+        if self._rule_exists_in_cache(table, chain, rule):
             Logger.debug(f"规则已存在: iptables -t {table} -A {chain} {' '.join(rule)}")
             return False
         
-        cmd = ['sudo', 'iptables']
+        cmd = ['iptables']
         if table != 'filter':
             cmd.extend(['-t', table])
         cmd.extend(['-A', chain] + rule)
         
-        CommandExecutor.run(cmd)
+        CommandExecutor.run_sudo(cmd)
+        self._cache[table].setdefault(chain, set()).add(self._rule_key(rule))
         Logger.info(f"已添加规则: iptables -t {table} -A {chain} {' '.join(rule)}")
         return True
     
-    def _load_existing_rules(self, table: str, chain: str):
-        """加载并缓存现有规则"""
-        cache_key = f"{table}:{chain}"
-        if cache_key in self._cache:
+    @staticmethod
+    def _canonical(tokens: List[bytes]) -> tuple:
+        """规则规范化：去除引号，按选项分组后稳定排序"""
+        groups, current = [], []
+        for token in tokens:
+            token = token.strip(b'"')
+            if (token == b'!' or token.startswith(b'-')) and current and current[-1] != b'!':
+                groups.append(tuple(current))
+                current = []
+            current.append(token)
+        if current:
+            groups.append(tuple(current))
+        return tuple(sorted(groups))
+    
+    @classmethod
+    def _rule_key(cls, rule: List[str]) -> tuple:
+        """查询规则只编码一次，再按与缓存相同的方式规范化"""
+        return cls._canonical(' '.join(rule).encode().split())
+    
+    @staticmethod
+    def snapshot(output: Optional[bytes] = None) -> 'IptablesSnapshot':
+        """单次 iptables-save 获取所有表的规则快照（output: 复用已取得的 iptables-save 输出）"""
+        snap = IptablesSnapshot()
+        if output is None:
+            result = CommandExecutor.run_sudo(['iptables-save'], check=False, return_bytes=True)
+            if result.returncode != 0:
+                return snap
+            output = result.stdout
+        
+        table = None
+        for line in output.splitlines():
+            if line.startswith(b'*'):
+                table = line[1:].strip().decode()
+            elif line.startswith(b'-A ') and table:
+                parts = line.split()
+                key = (table, parts[1].decode())
+                snap.rules.setdefault(key, []).append(b' '.join(parts[2:]))
+                snap.index.setdefault(key, set()).add(IptablesManager._canonical(parts[2:]))
+        return snap
+    
+    def _preload_all(self, table: str):
+        """一次性加载所有表的规则并按链建立索引"""
+        if table in self._cache:
             return
         
-        cmd = ['sudo', 'iptables']
-        if table != 'filter':
-            cmd.extend(['-t', table])
-        cmd.extend(['-S', chain])
-        
-        result = CommandExecutor.run(cmd, check=False)
-        self._cache[cache_key] = result.stdout if result.returncode == 0 else ""
+        snap = self.snapshot()
+        loaded = {t: {} for t in set(Config.IPTABLES_TABLES) | {table} if t not in self._cache}
+        for (t, chain), index in snap.index.items():
+            if t in loaded:
+                loaded[t][chain] = index
+        self._cache.update(loaded)
     
     def _rule_exists_in_cache(self, table: str, chain: str, rule: List[str]) -> bool:
         """从缓存中检查规则是否存在"""
-        cache_key = f"{table}:{chain}"
-        if cache_key not in self._cache:
-            self._load_existing_rules(table, chain)
-        
-        rule_str = ' '.join(rule)
-        return rule_str in self._cache[cache_key]
+        self._preload_all(table)
+        return self._rule_key(rule) in self._cache[table].get(chain, ())
     
     def commit(self) -> Dict[str, int]:
-        """批量提交所有规则"""
-        if not self.rules_to_add:
-            return {'added': 0, 'skipped': 0}
+        """批量提交所有规则（每张表一次 iptables-restore）"""
+        pending = {table: rules for table, rules in self.rules_to_add.items() if rules}
+        if not pending:
+            return {'added': 0, 'skipped': 0, 'sections': {}}
         
-        Logger.debug(f"开始批量处理 {len(self.rules_to_add)} 条规则...")
+        Logger.debug(f"开始批量处理 {sum(len(r) for r in pending.values())} 条规则...")
         
-        # 预加载规则缓存
-        tables_chains = set((r['table'], r['chain']) for r in self.rules_to_add)
-        for table, chain in tables_chains:
-            self._load_existing_rules(table, chain)
+        # 预加载规则缓存（每张表一次）
+        for table in pending:
+            self._preload_all(table)
         
         added, skipped = 0, 0
-        
-        for rule_info in self.rules_to_add:
-            table, chain, rule = rule_info['table'], rule_info['chain'], rule_info['rule']
-            
-            if self._rule_exists_in_cache(table, chain, rule):
-                Logger.debug(f"规则已存在: iptables -t {table} -A {chain} {' '.join(rule)}")
-                skipped += 1
-                continue
-            
-            cmd = ['sudo', 'iptables']
-            if table != 'filter':
-                cmd.extend(['-t', table])
-            cmd.extend(['-A', chain] + rule)
+        sections: Dict[Optional[str], Dict[str, int]] = {}
+        to_restore: Dict[str, List[Tuple[str, List[str], Optional[str]]]] = {}
+        
+        for table, rules in pending.items():
+            new_rules = []
+            for chain, rule, section in rules:
+                counts = sections.setdefault(section, {'added': 0, 'skipped': 0})
+                if self._rule_exists_in_cache(table, chain, rule):
+                    Logger.debug(f"规则已存在: iptables -t {table} -A {chain} {' '.join(rule)}")
+                    skipped += 1
+                    counts['skipped'] += 1
+                    continue
+                
+                new_rules.append((chain, rule, section))
             
-            try:
-                CommandExecutor.run(cmd)
-                Logger.info(f"已添加规则: iptables -t {table} -A {chain} {' '.join(rule)}")
-                added += 1
+            if new_rules:
+                to_restore[table] = new_rules
+        
+        # 各表分别提交；iptables-nft 下可并行，iptables-legacy 下会在全局 xtables 锁上排队（--wait）
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = {executor.submit(self._restore, table, new_rules): table
+                       for table, new_rules in to_restore.items()}
+            for future in as_completed(futures):
+                table = futures[future]
+                if not future.result():
+                    continue
                 
-                # 更新缓存
-                cache_key = f"{table}:{chain}"
-                self._cache[cache_key] += f"\n-A {chain} {' '.join(rule)}"
-            except Exception as e:
-                Logger.error(f"添加规则失败: {e}")
-        
-        self.rules_to_add = []
+                for chain, rule, section in to_restore[table]:
+                    Logger.info(f"已添加规则: iptables -t {table} -A {chain} {' '.join(rule)}")
+                    # 更新缓存
+                    self._cache[table].setdefault(chain, set()).add(self._rule_key(rule))
+                    sections[section]['added'] += 1
+                added += len(to_restore[table])
+        
+        self.rules_to_add = {table: [] for table in Config.IPTABLES_TABLES}
+        self._queued.clear()
         Logger.debug(f"批量处理完成: 添加 {added} 条，跳过 {skipped} 条")
-        return {'added': added, 'skipped': skipped}
+        return {'added': added, 'skipped': skipped, 'sections': sections}
     
     @staticmethod
-    def list_rules(table: str, chain: str) -> List[str]:
-        """列出规则"""
-        cmd = ['sudo', 'iptables']
+    def _restore(table: str, rules: List[Tuple[str, List[str], Optional[str]]]) -> bool:
+        """通过单次 iptables-restore 原子提交一张表的规则"""
+        lines = [f"*{table}"]
+        lines.extend(f"-A {chain} {' '.join(rule)}" for chain, rule, _ in rules)
+        lines.append("COMMIT\n")
+        payload = '\n'.join(lines)
+        
+        try:
+            proc = subprocess.Popen(CommandExecutor.sudo_prefix(['iptables-restore', '--noflush', '--wait=5']),
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, text=True)
+            _, stderr = proc.communicate(payload)
+        except OSError as e:
+            Logger.error(f"添加规则失败: iptables-restore ({table}) {e}")
+            return False
+        if proc.returncode != 0:
+            Logger.error(f"添加规则失败: iptables-restore ({table}) {stderr.strip()}")
+            return False
+        return True
+    
+    @staticmethod
+    def list_rules(table: str, chain: str,
+                   snapshot: Optional['IptablesSnapshot'] = None) -> List[str]:
+        """列出规则（传入快照时直接返回快照中的规则）"""
+        if snapshot is not None:
+            return snapshot.list_rules(table, chain)
+        
+        cmd = ['iptables']
         if table != 'filter':
             cmd.extend(['-t', table])
         cmd.extend(['-L', chain, '-n', '--line-numbers'])
         
-        result = CommandExecutor.run(cmd)
+        result = CommandExecutor.run_sudo(cmd)
         return result.stdout.strip().split('\n')[2:]
 
 # ==================== 网络信息获取 ====================
 
 class NetworkInfoProvider:
     """网络信息提供者"""
+    _core_v1 = None
+    _kube_lock = threading.Lock()
+    
+    @classmethod
+    def invalidate_cache(cls):
+        """清除探测结果缓存（Docker 重启后网络状态可能变化）"""
+        cls.get_physical_interface.cache_clear()
+        cls.get_docker_bridges.cache_clear()
+        cls.get_minikube_info.cache_clear()
+        cls.get_minikube_dns_ip.cache_clear()
+        cls._get_service_cidr_fast.cache_clear()
+        cls._interface_exists.cache_clear()
     
     @staticmethod
+    @lru_cache(maxsize=1)
     def get_physical_interface() -> Optional[str]:
         """获取物理网卡名称"""
         result = CommandExecutor.run(['ip', 'route'])
-        match = re.search(r'default.*dev\s+(\S+)', result.stdout)
+        match = _DEFAULT_DEV_RE.search(result.stdout)
         return match.group(1) if match else None
     
     @staticmethod
+    def _bridge_fields(network: Dict) -> Tuple[str, str]:
+        """从 API 返回的网络对象中提取网桥名称与子网"""
+        bridge_name = (network.get('Options') or {}).get('com.docker.network.bridge.name')
+        if not bridge_name:
+            bridge_name = f"br-{network['Id'][:12]}"
+        subnets = [c['Subnet'] for c in (network.get('IPAM') or {}).get('Config') or [] if c.get('Subnet')]
+        return bridge_name, subnets[0] if subnets else ''
+    
+    @staticmethod
+    @lru_cache(maxsize=1)
     def get_docker_bridges() -> List[BridgeInfo]:
-        """获取所有 Docker 网桥信息（批量加速版）"""
+        """获取所有 Docker 网桥信息（优先走 Docker API）"""
+        if not DockerAPI.available():
+            return NetworkInfoProvider._get_docker_bridges_cli()
+        
+        filters = quote(json.dumps({'driver': ['bridge']}))
+        networks = DockerAPI.get_json(f'/networks?filters={filters}') or []
+        bridges: List[BridgeInfo] = []
+        for network in networks:
+            bridge_name, subnet = NetworkInfoProvider._bridge_fields(network)
+            if subnet and NetworkInfoProvider._interface_exists(bridge_name):
+                bridges.append(BridgeInfo(name=bridge_name, subnet=subnet, network_id=network['Id']))
+        return bridges
+    
+    @staticmethod
+    def _get_docker_bridges_cli() -> List[BridgeInfo]:
+        """通过 docker CLI 获取所有 Docker 网桥信息（批量加速版）"""
         bridges: List[BridgeInfo] = []
         # 先获取所有 bridge 驱动网络ID
         result = CommandExecutor.run(['docker', 'network', 'ls', '-q', '--filter', 'driver=bridge'])
@@ -394,17 +682,15 @@ class NetworkInfoProvider:
         # 一次性 inspect 所有网络，减少子进程调用次数
         fmt = '{{.ID}}|{{index .Options "com.docker.network.bridge.name"}}|{{range .IPAM.Config}}{{.Subnet}}{{end}}'
         inspect_cmd = ['docker', 'network', 'inspect'] + network_ids + ['--format', fmt]
-        result = CommandExecutor.run(inspect_cmd, check=False)
+        result = CommandExecutor.run(inspect_cmd, check=False, return_bytes=True)
         if result.returncode != 0:
             return bridges
         
-        for line in result.stdout.strip().splitlines():
-            parts = line.split('|')
+        for line in result.stdout.splitlines():
+            parts = line.split(b'|')
             if len(parts) != 3:
                 continue
-            nid, bridge_name, subnet = parts
-            bridge_name = bridge_name.strip()
-            subnet = subnet.strip()
+            nid, bridge_name, subnet = (part.strip().decode() for part in parts)
             if not bridge_name or bridge_name == '<no value>':
                 bridge_name = f"br-{nid[:12]}"
             if not NetworkInfoProvider._interface_exists(bridge_name):
@@ -415,27 +701,58 @@ class NetworkInfoProvider:
         return bridges
     
     @staticmethod
+    @lru_cache(maxsize=1)
     def get_minikube_info() -> Optional[MinikubeInfo]:
-        """获取 Minikube 信息（减少 docker 调用次数）"""
-        result = CommandExecutor.run(
-            ['docker', 'ps', '--filter', 'name=minikube', '--format', '{{.ID}}'],
-            check=False
+        """获取 Minikube 信息（优先走 Docker API）"""
+        if DockerAPI.available():
+            network = NetworkInfoProvider._get_minikube_network_api()
+        else:
+            network = NetworkInfoProvider._get_minikube_network_cli()
+        if not network:
+            return None
+        
+        bridge_name, container_ip, subnet = network
+        service_cidr = NetworkInfoProvider._get_service_cidr_fast()
+        
+        return MinikubeInfo(
+            bridge_name=bridge_name,
+            container_ip=container_ip,
+            subnet=subnet,
+            service_cidr=service_cidr
         )
-        container_id = result.stdout.strip()
-        if not container_id:
+    
+    @staticmethod
+    def _get_minikube_network_api() -> Optional[Tuple[str, str, str]]:
+        """通过 Docker API 获取 Minikube 的 (网桥名称, 容器 IP, 子网)"""
+        container = DockerAPI.get_json('/containers/minikube/json')
+        if not container or not container.get('State', {}).get('Running'):
+            return None
+        
+        endpoints = list((container.get('NetworkSettings') or {}).get('Networks', {}).values())
+        if not endpoints:
+            return None
+        network = DockerAPI.get_json(f"/networks/{endpoints[0]['NetworkID']}")
+        if not network:
             return None
         
-        # 单次 inspect 获取 networkID 与 container IP
+        bridge_name, subnet = NetworkInfoProvider._bridge_fields(network)
+        return bridge_name, endpoints[0]['IPAddress'], subnet
+    
+    @staticmethod
+    def _get_minikube_network_cli() -> Optional[Tuple[str, str, str]]:
+        """通过 docker CLI 获取 Minikube 的 (网桥名称, 容器 IP, 子网)"""
+        # 单次 inspect 同时获取运行状态、networkID 与 container IP
         result = CommandExecutor.run(
-            ['docker', 'inspect', container_id, '--format',
-             '{{range .NetworkSettings.Networks}}{{.NetworkID}}|{{.IPAddress}}{{end}}'],
+            ['docker', 'inspect', '--type', 'container', 'minikube', '--format',
+             '{{.State.Running}}|{{range .NetworkSettings.Networks}}{{.NetworkID}}|{{.IPAddress}}{{end}}'],
             check=False
         )
-        if result.returncode != 0 or '|' not in result.stdout:
+        parts = [s.strip() for s in result.stdout.strip().split('|')]
+        if result.returncode != 0 or len(parts) != 3 or parts[0] != 'true':
             return None
-        network_id, container_ip = [s.strip() for s in result.stdout.strip().split('|', 1)]
+        _, network_id, container_ip = parts
         
-        # 单次 network inspect 获取 bridge name 与 subnet
+        # 网桥名称只存在于网络对象的 Options 中，需再 inspect 一次网络
         fmt = '{{index .Options "com.docker.network.bridge.name"}}|{{range .IPAM.Config}}{{.Subnet}}{{end}}'
         result = CommandExecutor.run(
             ['docker', 'network', 'inspect', network_id, '--format', fmt],
@@ -447,111 +764,201 @@ class NetworkInfoProvider:
         if not bridge_name or bridge_name == '<no value>':
             bridge_name = f"br-{network_id[:12]}"
         
-        service_cidr = NetworkInfoProvider._get_service_cidr_fast()
-        
-        return MinikubeInfo(
-            bridge_name=bridge_name,
-            container_ip=container_ip,
-            subnet=subnet,
-            service_cidr=service_cidr
-        )
+        return bridge_name, container_ip, subnet
     
     @staticmethod
+    @lru_cache(maxsize=1)
     def get_minikube_dns_ip() -> Optional[str]:
         """获取 Minikube DNS 服务 IP"""
-        if not CommandExecutor.command_exists('kubectl'):
+        api = NetworkInfoProvider._kube_api()
+        if api is None and not CommandExecutor.command_exists('kubectl'):
             return None
         
         for svc_name in ['kube-dns', 'coredns']:
-            result = CommandExecutor.run(
-                ['kubectl', 'get', 'svc', '-n', 'kube-system', svc_name,
-                 '-o', 'jsonpath={.spec.clusterIP}'],
-                check=False
-            )
-            dns_ip = result.stdout.strip()
+            dns_ip = NetworkInfoProvider._get_service_ip(api, 'kube-system', svc_name)
             if dns_ip:
                 return dns_ip
         
         return None
     
     @staticmethod
+    @lru_cache(maxsize=1)
     def _get_service_cidr_fast() -> Optional[str]:
         """快速获取 Kubernetes Service CIDR"""
-        if not CommandExecutor.command_exists('kubectl'):
+        api = NetworkInfoProvider._kube_api()
+        if api is None and not CommandExecutor.command_exists('kubectl'):
             return None
         
-        strategies = [
-            {
-                'name': 'API Server Pod',
-                'cmd': ['kubectl', 'get', 'pod', '-n', 'kube-system',
-                       '-l', 'component=kube-apiserver',
-                       '-o', 'jsonpath={.items[0].spec.containers[0].command}'],
-                'pattern': r'service-cluster-ip-range=([0-9./]+)'
-            },
-            {
-                'name': 'kubeadm-config',
-                'cmd': ['kubectl', 'get', 'cm', '-n', 'kube-system', 'kubeadm-config',
-                       '-o', 'jsonpath={.data.ClusterConfiguration}'],
-                'pattern': r'serviceSubnet:\s*([0-9./]+)'
-            },
-            {
-                'name': 'kube-proxy',
-                'cmd': ['kubectl', 'get', 'cm', '-n', 'kube-system', 'kube-proxy',
-                       '-o', 'jsonpath={.data.config\\.conf}'],
-                'pattern': r'clusterCIDR:\s*"?([0-9./]+)"?'
-            }
-        ]
-        
-        for strategy in strategies:
-            result = CommandExecutor.run(strategy['cmd'], check=False)
-            if result.returncode == 0:
-                match = re.search(strategy['pattern'], result.stdout)
+        if api is not None:
+            kube_call = NetworkInfoProvider._kube_call
+            strategies = [
+                {
+                    'name': 'API Server Pod',
+                    'fetch': partial(kube_call, lambda: ' '.join(api.list_namespaced_pod(
+                        'kube-system', label_selector='component=kube-apiserver'
+                    ).items[0].spec.containers[0].command)),
+                    'pattern': _APISERVER_CIDR_RE
+                },
+                {
+                    'name': 'kubeadm-config',
+                    'fetch': partial(kube_call, lambda: (api.read_namespaced_config_map(
+                        'kubeadm-config', 'kube-system').data or {}).get('ClusterConfiguration')),
+                    'pattern': _KUBEADM_CIDR_RE
+                },
+                {
+                    'name': 'kube-proxy',
+                    'fetch': partial(kube_call, lambda: (api.read_namespaced_config_map(
+                        'kube-proxy', 'kube-system').data or {}).get('config.conf')),
+                    'pattern': _KUBE_PROXY_CIDR_RE
+                }
+            ]
+        else:
+            kubectl_output = NetworkInfoProvider._kubectl_output
+            strategies = [
+                {
+                    'name': 'API Server Pod',
+                    'fetch': partial(kubectl_output,
+                                     ['kubectl', 'get', 'pod', '-n', 'kube-system',
+                                      '-l', 'component=kube-apiserver',
+                                      '-o', 'jsonpath={.items[0].spec.containers[0].command}']),
+                    'pattern': _APISERVER_CIDR_RE
+                },
+                {
+                    'name': 'kubeadm-config',
+                    'fetch': partial(kubectl_output,
+                                     ['kubectl', 'get', 'cm', '-n', 'kube-system', 'kubeadm-config',
+                                      '-o', 'jsonpath={.data.ClusterConfiguration}']),
+                    'pattern': _KUBEADM_CIDR_RE
+                },
+                {
+                    'name': 'kube-proxy',
+                    'fetch': partial(kubectl_output,
+                                     ['kubectl', 'get', 'cm', '-n', 'kube-system', 'kube-proxy',
+                                      '-o', 'jsonpath={.data.config\\.conf}']),
+                    'pattern': _KUBE_PROXY_CIDR_RE
+                }
+            ]
+        
+        # 各策略并发获取，但按优先级取结果（kube-proxy 的 clusterCIDR 为 Pod CIDR，仅作兜底）
+        executor = ThreadPoolExecutor(max_workers=len(strategies))
+        try:
+            futures = [executor.submit(strategy['fetch']) for strategy in strategies]
+            for strategy, future in zip(strategies, futures):
+                output = future.result()
+                if not output:
+                    continue
+                match = strategy['pattern'].search(output)
                 if match:
                     cidr = match.group(1)
                     Logger.debug(f"通过 {strategy['name']} 获取 Service CIDR: {cidr}")
                     return cidr
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
         
-        result = CommandExecutor.run(
-            ['kubectl', 'get', 'svc', '-n', 'default', 'kubernetes',
-             '-o', 'jsonpath={.spec.clusterIP}'],
-            check=False
-        )
-        if result.returncode == 0:
-            service_ip = result.stdout.strip()
-            if service_ip and re.match(r'^\d+\.\d+\.\d+\.\d+$', service_ip):
-                cidr = '.'.join(service_ip.split('.')[:2]) + '.0.0/16'
-                Logger.debug(f"通过 kubernetes service 推断 Service CIDR: {cidr}")
-                return cidr
+        service_ip = NetworkInfoProvider._get_service_ip(api, 'default', 'kubernetes')
+        if service_ip and _IPV4_RE.match(service_ip):
+            cidr = '.'.join(service_ip.split('.')[:2]) + '.0.0/16'
+            Logger.debug(f"通过 kubernetes service 推断 Service CIDR: {cidr}")
+            return cidr
         
         return None
     
+    @classmethod
+    def _kube_api(cls):
+        """获取 CoreV1Api 单例（kubernetes 客户端不可用时返回 None）"""
+        with cls._kube_lock:
+            if cls._core_v1 is None:
+                cls._core_v1 = False
+                if k8s_client is not None:
+                    try:
+                        k8s_config.load_kube_config()
+                        cls._core_v1 = k8s_client.CoreV1Api()
+                    except Exception as e:
+                        Logger.debug(f"无法加载 kubeconfig，回退到 kubectl: {e}")
+            return cls._core_v1 or None
+    
+    @staticmethod
+    def _kube_call(fn) -> Optional[str]:
+        """调用 Kubernetes API，失败时返回 None"""
+        try:
+            return fn()
+        except Exception as e:
+            Logger.debug(f"Kubernetes API 请求失败: {e}")
+            return None
+    
+    @staticmethod
+    def _kubectl_output(cmd: List[str]) -> Optional[str]:
+        """执行 kubectl，成功时返回输出"""
+        result = CommandExecutor.run(cmd, check=False)
+        return result.stdout if result.returncode == 0 else None
+    
+    @staticmethod
+    def _get_service_ip(api, namespace: str, name: str) -> Optional[str]:
+        """获取 Service 的 ClusterIP"""
+        if api is not None:
+            return NetworkInfoProvider._kube_call(
+                lambda: api.read_namespaced_service(name, namespace).spec.cluster_ip)
+        output = NetworkInfoProvider._kubectl_output(
+            ['kubectl', 'get', 'svc', '-n', namespace, name, '-o', 'jsonpath={.spec.clusterIP}'])
+        return output.strip() if output else None
+    
     @staticmethod
     @lru_cache(maxsize=128)
     def _interface_exists(interface: str) -> bool:
-        """检查网络接口是否存在（带缓存）"""
-        result = CommandExecutor.run(['ip', 'link', 'show', interface], check=False)
-        return result.returncode == 0
+        """检查网络接口是否存在（查 /sys/class/net，不启动子进程，带缓存）"""
+        return bool(interface) and '/' not in interface and os.path.exists(f'/sys/class/net/{interface}')
 
 # ==================== 路由管理 ====================
 
 class RouteManager:
     """路由管理器"""
+    _index: Optional[set] = None
+    
+    @classmethod
+    def _routes(cls) -> set:
+        """一次性解析路由表，索引为 (目标网段, 网关) 集合"""
+        if cls._index is None:
+            result = CommandExecutor.run(['ip', '-j', 'route', 'show'], check=False)
+            index = None
+            if result.returncode == 0:
+                try:
+                    index = {(r.get('dst'), r.get('gateway')) for r in json.loads(result.stdout)}
+                except (ValueError, TypeError, AttributeError):
+                    index = None
+            if index is None:
+                # 旧版或 BusyBox iproute2 不支持 -j，回退到文本输出
+                Logger.debug("ip -j route 不可用，回退到文本解析")
+                index = cls._parse_text_routes()
+            cls._index = index
+        return cls._index
     
     @staticmethod
-    def route_exists(network: str, gateway: str) -> bool:
+    def _parse_text_routes() -> set:
+        """解析 ip route show 文本输出（格式: <目标网段> [via <网关>] ...）"""
+        result = CommandExecutor.run(['ip', 'route', 'show'], check=False)
+        index = set()
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if not parts:
+                continue
+            gateway = parts[2] if len(parts) > 2 and parts[1] == 'via' else None
+            index.add((parts[0], gateway))
+        return index
+    
+    @classmethod
+    def route_exists(cls, network: str, gateway: str) -> bool:
         """检查路由是否存在"""
-        result = CommandExecutor.run(['ip', 'route', 'show'])
-        pattern = f"^{re.escape(network)} via {re.escape(gateway)}"
-        return bool(re.search(pattern, result.stdout, re.MULTILINE))
+        return (network, gateway) in cls._routes()
     
-    @staticmethod
-    def add_route(network: str, gateway: str) -> bool:
+    @classmethod
+    def add_route(cls, network: str, gateway: str) -> bool:
         """添加路由（如果不存在）"""
-        if RouteManager.route_exists(network, gateway):
+        if cls.route_exists(network, gateway):
             Logger.debug(f"路由已存在: {network} via {gateway}")
             return False
         
         CommandExecutor.run_sudo(['ip', 'route', 'add', network, 'via', gateway])
+        cls._routes().add((network, gateway))
         Logger.info(f"已添加路由: {network} via {gateway}")
         return True
 
@@ -565,6 +972,7 @@ class NetworkConfigurator:
         self.iptables = IptablesManager(batch_mode=True)
         self.route_manager = RouteManager()
         self._cache = cached_info or {}
+        self._sections: List[str] = []
         self._physical_if = None
         self._bridges = None
         self._minikube_info = None
@@ -590,18 +998,48 @@ class NetworkConfigurator:
                                  self.info_provider.get_minikube_info()
         return self._minikube_info
     
-    def _configure_forwarding(self, title: str, rules_generator):
-        """通用的转发配置方法"""
+    @staticmethod
+    def _describe(bridges: List[BridgeInfo]) -> str:
+        """网桥列表的单行摘要"""
+        return ', '.join(f"{bridge.name} ({bridge.subnet})" for bridge in bridges) or '无'
+    
+    def _configure_forwarding(self, title: str, rules_generator, commit: bool = True):
+        """通用的转发配置方法（commit=False 时仅入队，由调用方统一提交）"""
         Logger.section(title)
         
-        for rule_info in rules_generator():
-            self.iptables.add_rule(**rule_info)
+        queued = 0
+        for table, chain, rule in rules_generator():
+            self.iptables.add_rule(table, chain, rule, section=title)
+            queued += 1
+        
+        if not commit:
+            self._sections.append(title)
+            Logger.debug(f"本节规则已加入批量队列: {queued} 条")
+            return
         
         stats = self.iptables.commit()
         if stats['added'] > 0:
             Logger.info(f"✅ 批量添加了 {stats['added']} 条规则")
     
-    def configure_docker_bridges_nat(self):
+    def configure_all(self):
+        """执行全部配置，所有 iptables 规则合并为一次提交"""
+        self.configure_docker_bridges_nat(commit=False)
+        self.configure_tun0_to_bridges(commit=False)
+        self.configure_minikube_routes()
+        self.configure_minikube_dns()
+        self.configure_bridges_to_minikube(commit=False)
+        self.configure_bridge_internal_communication(commit=False)
+        
+        Logger.section("提交 iptables 规则")
+        stats = self.iptables.commit()
+        Logger.info(f"✅ 批量添加了 {stats['added']} 条规则，{stats['skipped']} 条已存在")
+        for title in self._sections:
+            counts = stats['sections'].get(title)
+            if counts:
+                Logger.info(f"  ├─ {title}: 添加 {counts['added']} 条，跳过 {counts['skipped']} 条")
+        self._sections.clear()
+    
+    def configure_docker_bridges_nat(self, commit: bool = True):
         """配置 Docker 网桥访问外网"""
         physical_if = self.physical_interface
         if not physical_if:
@@ -615,19 +1053,15 @@ class NetworkConfigurator:
             return
         
         def rules():
+            Logger.info(f"配置网桥: {self._describe(bridges)}")
             for bridge in bridges:
-                Logger.info(f"配置网桥: {bridge.name} (子网: {bridge.subnet})")
-                yield {'table': 'filter', 'chain': 'FORWARD',
-                       'rule': ['-i', bridge.name, '-o', physical_if, '-j', 'ACCEPT']}
-                yield {'table': 'filter', 'chain': 'FORWARD',
-                       'rule': ['-i', physical_if, '-o', bridge.name,
-                               '-m', 'state', '--state', 'RELATED,ESTABLISHED', '-j', 'ACCEPT']}
-                yield {'table': 'nat', 'chain': 'POSTROUTING',
-                       'rule': ['-s', bridge.subnet, '-o', physical_if, '-j', 'MASQUERADE']}
-        
-        self._configure_forwarding("1. 配置 Docker 网桥访问外网", rules)
-    
-    def configure_tun0_to_bridges(self):
+                yield 'filter', 'FORWARD', ['-i', bridge.name, '-o', physical_if] + _ACCEPT
+                yield 'filter', 'FORWARD', ['-i', physical_if, '-o', bridge.name] + _ACCEPT_ESTAB
+                yield 'nat', 'POSTROUTING', ['-s', bridge.subnet, '-o', physical_if] + _MASQUERADE
+        
+        self._configure_forwarding("1. 配置 Docker 网桥访问外网", rules, commit)
+    
+    def configure_tun0_to_bridges(self, commit: bool = True):
         """配置 tun0 到所有 Docker 网桥的转发规则"""
         if not self.info_provider._interface_exists('tun0'):
             Logger.warn("tun0 设备不存在，跳过配置")
@@ -640,15 +1074,12 @@ class NetworkConfigurator:
             return
         
         def rules():
+            Logger.info(f"配置 tun0 与网桥的转发规则: {self._describe(bridges)}")
             for bridge in bridges:
-                Logger.info(f"配置 tun0 与网桥 {bridge.name} ({bridge.subnet}) 的转发规则")
-                yield {'table': 'filter', 'chain': 'FORWARD',
-                       'rule': ['-i', 'tun0', '-o', bridge.name, '-j', 'ACCEPT']}
-                yield {'table': 'filter', 'chain': 'FORWARD',
-                       'rule': ['-i', bridge.name, '-o', 'tun0',
-                               '-m', 'state', '--state', 'RELATED,ESTABLISHED', '-j', 'ACCEPT']}
+                yield 'filter', 'FORWARD', ['-i', 'tun0', '-o', bridge.name] + _ACCEPT
+                yield 'filter', 'FORWARD', ['-i', bridge.name, '-o', 'tun0'] + _ACCEPT_ESTAB
         
-        self._configure_forwarding("2. 配置 tun0 到所有 Docker 网桥的转发规则", rules)
+        self._configure_forwarding("2. 配置 tun0 到所有 Docker 网桥的转发规则", rules, commit)
     
     def configure_minikube_routes(self):
         """配置 Minikube 集群子网路由"""
@@ -668,6 +1099,12 @@ class NetworkConfigurator:
         else:
             Logger.warn("无法获取 Kubernetes Service CIDR，跳过路由配置")
     
+    @staticmethod
+    def _strip_comments(content: bytes) -> bytes:
+        """去除配置文件中的注释行"""
+        return b''.join(line for line in content.splitlines(keepends=True)
+                        if not line.lstrip().startswith(b'#'))
+    
     def configure_minikube_dns(self):
         """配置 Minikube DNS"""
         Logger.section("4. 配置 Minikube DNS")
@@ -677,7 +1114,7 @@ class NetworkConfigurator:
             Logger.warn("未找到运行中的 Minikube 容器，跳过 DNS 配置")
             return
         
-        dns_ip = self.info_provider.get_minikube_dns_ip()
+        dns_ip = self._cache.get('dns_ip') or self.info_provider.get_minikube_dns_ip()
         if not dns_ip:
             Logger.warn("无法获取 Minikube DNS 服务 IP，跳过 DNS 配置")
             Logger.info("提示: 请确保 kubectl 已配置并可以访问 Minikube 集群")
@@ -689,7 +1126,7 @@ class NetworkConfigurator:
             Logger.warn("systemctl 命令不可用，跳过 DNS 配置")
             return
         
-        result = CommandExecutor.run(['systemctl', 'is-active', 'systemd-resolved'], check=False)
+        result = CommandExecutor.run(['systemctl', 'is-active', 'systemd-resolved'], check=False, quiet=True)
         if result.returncode != 0:
             Logger.warn("systemd-resolved 服务未运行，跳过 DNS 配置")
             return
@@ -700,22 +1137,21 @@ class NetworkConfigurator:
         Logger.info(f"创建 DNS 配置目录: {conf_dir}")
         conf_dir.mkdir(parents=True, exist_ok=True)
         
-        needs_update = True
-        if conf_file.exists():
-            with open(conf_file, 'r') as f:
-                if f"DNS={dns_ip}" in f.read():
-                    Logger.debug(f"DNS 配置已存在且正确: {dns_ip}")
-                    needs_update = False
+        settings = f"""[Resolve]
+DNS={dns_ip}
+Domains=cluster.local
+"""
+        
+        # 忽略注释（含生成时间）后比较，内容一致时跳过写入及 systemd-resolved 重启
+        actual = conf_file.read_bytes() if conf_file.exists() else b''
+        needs_update = self._strip_comments(actual) != settings.encode()
         
         if needs_update:
             Logger.info(f"写入 DNS 配置文件: {conf_file}")
             
             config_content = f"""# Minikube DNS 配置
 # 自动生成于: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-[Resolve]
-DNS={dns_ip}
-Domains=cluster.local
-"""
+{settings}"""
             
             with open(conf_file, 'w') as f:
                 f.write(config_content)
@@ -728,16 +1164,18 @@ Domains=cluster.local
             CommandExecutor.run_sudo(['systemctl', 'restart', 'systemd-resolved'])
             Logger.info("✅ systemd-resolved 服务已重启")
             
-            time.sleep(1)
-            result = CommandExecutor.run(['systemctl', 'is-active', 'systemd-resolved'], check=False)
+            # systemctl restart 同步等待服务就绪，无需再轮询
+            result = CommandExecutor.run(['systemctl', 'is-active', '--quiet', 'systemd-resolved'],
+                                         check=False, quiet=True)
             if result.returncode == 0:
                 Logger.info("✅ DNS 配置已生效")
             else:
                 Logger.error("systemd-resolved 服务启动失败")
         else:
+            Logger.debug(f"DNS 配置已存在且正确: {dns_ip}")
             Logger.info("✅ DNS 配置无需更新")
     
-    def configure_bridges_to_minikube(self):
+    def configure_bridges_to_minikube(self, commit: bool = True):
         """配置其他 Docker 网桥与 Minikube 的通信"""
         minikube_info = self.minikube_info
         if not minikube_info:
@@ -751,19 +1189,16 @@ Domains=cluster.local
             return
         
         def rules():
-            for bridge in bridges:
-                if bridge.name == minikube_info.bridge_name:
-                    continue
-                Logger.info(f"配置网桥 {bridge.name} 与 Minikube 的通信")
-                yield {'table': 'filter', 'chain': 'FORWARD',
-                       'rule': ['-i', bridge.name, '-o', minikube_info.bridge_name, '-j', 'ACCEPT']}
-                yield {'table': 'filter', 'chain': 'FORWARD',
-                       'rule': ['-i', minikube_info.bridge_name, '-o', bridge.name,
-                               '-m', 'state', '--state', 'RELATED,ESTABLISHED', '-j', 'ACCEPT']}
-        
-        self._configure_forwarding("5. 配置 Docker 网桥与 Minikube 的通信", rules)
+            minikube_bridge = minikube_info.bridge_name
+            others = [bridge for bridge in bridges if bridge.name != minikube_bridge]
+            Logger.info(f"配置网桥与 Minikube 的通信: {self._describe(others)}")
+            for bridge in others:
+                yield 'filter', 'FORWARD', ['-i', bridge.name, '-o', minikube_bridge] + _ACCEPT
+                yield 'filter', 'FORWARD', ['-i', minikube_bridge, '-o', bridge.name] + _ACCEPT_ESTAB
+        
+        self._configure_forwarding("5. 配置 Docker 网桥与 Minikube 的通信", rules, commit)
     
-    def configure_bridge_internal_communication(self):
+    def configure_bridge_internal_communication(self, commit: bool = True):
         """配置非 Minikube 的 Docker 网桥子网内通信"""
         minikube_info = self.minikube_info
         minikube_bridge = minikube_info.bridge_name if minikube_info else None
@@ -774,37 +1209,35 @@ Domains=cluster.local
             return
         
         def rules():
-            for bridge in bridges:
-                if minikube_bridge and bridge.name == minikube_bridge:
-                    Logger.debug(f"跳过 Minikube 网桥: {bridge.name}")
-                    continue
-                
-                Logger.info(f"配置网桥 {bridge.name} ({bridge.subnet}) 子网内通信")
-                yield {'table': 'filter', 'chain': 'FORWARD',
-                       'rule': ['-i', bridge.name, '-o', bridge.name, '-j', 'ACCEPT']}
-                yield {'table': 'filter', 'chain': 'FORWARD',
-                       'rule': ['-i', bridge.name, '-m', 'state', '--state', 'RELATED,ESTABLISHED', '-j', 'ACCEPT']}
-                yield {'table': 'filter', 'chain': 'FORWARD',
-                       'rule': ['-o', bridge.name, '-m', 'state', '--state', 'RELATED,ESTABLISHED', '-j', 'ACCEPT']}
-        
-        self._configure_forwarding("6. 配置 Docker 网桥子网内通信", rules)
-    
-    def cleanup_invalid_rules(self):
-        """清理无效的网桥规则"""
+            if minikube_bridge:
+                Logger.debug(f"跳过 Minikube 网桥: {minikube_bridge}")
+            others = [bridge for bridge in bridges if bridge.name != minikube_bridge]
+            Logger.info(f"配置网桥子网内通信: {self._describe(others)}")
+            for bridge in others:
+                yield 'filter', 'FORWARD', ['-i', bridge.name, '-o', bridge.name] + _ACCEPT
+                yield 'filter', 'FORWARD', ['-i', bridge.name] + _ACCEPT_ESTAB
+                yield 'filter', 'FORWARD', ['-o', bridge.name] + _ACCEPT_ESTAB
+        
+        self._configure_forwarding("6. 配置 Docker 网桥子网内通信", rules, commit)
+    
+    def cleanup_invalid_rules(self) -> IptablesSnapshot:
+        """清理无效的网桥规则（返回检查所用的快照，供后续统计复用）"""
         Logger.info("开始清理无效的网桥规则...")
         
         result = CommandExecutor.run(['ip', 'link', 'show'])
-        existing_bridges = set(re.findall(r'br-[a-f0-9]+', result.stdout))
+        existing_bridges = set(_BRIDGE_RE.findall(result.stdout))
         
+        snapshot = IptablesManager.snapshot()
         for table, chain in [('filter', 'FORWARD'), ('nat', 'POSTROUTING')]:
-            rules = IptablesManager.list_rules(table, chain)
+            rules = IptablesManager.list_rules(table, chain, snapshot)
             for rule in rules:
-                bridges_in_rule = re.findall(r'br-[a-f0-9]+', rule)
+                bridges_in_rule = _BRIDGE_RE.findall(rule)
                 for bridge in bridges_in_rule:
                     if bridge not in existing_bridges:
                         Logger.warn(f"发现无效网桥规则: {rule}")
         
         Logger.info("清理检查完成")
+        return snapshot
 
 # ==================== 拓扑图生成器 ====================
 
@@ -814,7 +1247,8 @@ class TopologyGenerator:
     def __init__(self):
         self.info_provider = NetworkInfoProvider()
     
-    def _check_internal_communication(self, bridge_name: str) -> bool:
+    def _check_internal_communication(self, bridge_name: str,
+                                      snapshot: Optional[IptablesSnapshot] = None) -> bool:
         """检查网桥子网内通信是否已配置"""
         rules_to_check = [
             ['-i', bridge_name, '-o', bridge_name, '-j', 'ACCEPT'],
@@ -822,104 +1256,205 @@ class TopologyGenerator:
             ['-o', bridge_name, '-m', 'state', '--state', 'RELATED,ESTABLISHED', '-j', 'ACCEPT']
         ]
         
-        return all(IptablesManager.rule_exists('filter', 'FORWARD', rule) for rule in rules_to_check)
+        return all(IptablesManager.rule_exists('filter', 'FORWARD', rule, snapshot)
+                   for rule in rules_to_check)
     
     def generate(self):
-        """生成网络拓扑图"""
+        """生成网络拓扑图（输出先缓冲，最后一次写出）"""
         Logger.section("7. 网络拓扑图")
         
-        print("┌─────────────────────────────────────────────────────────────┐")
-        print("│                    网络转发拓扑图                            │")
-        print("└─────────────────────────────────────────────────────────────┘\n")
+        # iptables-save 与 ip route 并发执行；后续规则检查与统计均查快照完成
+        save_result, route_result = asyncio.run(CommandExecutor.run_many_async(
+            [CommandExecutor.sudo_prefix(['iptables-save']), ['ip', 'route']]))
+        snapshot = IptablesManager.snapshot(save_result.stdout if save_result.returncode == 0 else b'')
+        
+        lines: List[str] = []
+        lines.append("┌─────────────────────────────────────────────────────────────┐")
+        lines.append("│                    网络转发拓扑图                            │")
+        lines.append("└─────────────────────────────────────────────────────────────┘\n")
         
         physical_if = self.info_provider.get_physical_interface()
         minikube_info = self.info_provider.get_minikube_info()
         
-        print(f"📡 物理网卡: {physical_if}")
-        print("🔧 TUN 设备: tun0\n")
+        lines.append(f"📡 物理网卡: {physical_if}")
+        lines.append("🔧 TUN 设备: tun0\n")
         
-        print("🐳 Docker 网桥:")
+        lines.append("🐳 Docker 网桥:")
         bridges = self.info_provider.get_docker_bridges()
+        tun0_exists = self.info_provider._interface_exists('tun0')
+        mk_bridge_name = minikube_info.bridge_name if minikube_info else None
+        
+        physical_line = f"  │   ├─> {physical_if} (外网)"
+        minikube_line = f"  │   ├─> {mk_bridge_name} (Minikube)" if mk_bridge_name else None
+        tun0_line = "  │   └─> tun0 (宿主机)" if tun0_exists else None
         
         for bridge in bridges:
-            is_minikube = minikube_info and bridge.name == minikube_info.bridge_name
-            internal_comm = self._check_internal_communication(bridge.name)
+            is_minikube = bridge.name == mk_bridge_name
+            internal_comm = not is_minikube and self._check_internal_communication(bridge.name, snapshot)
             
             if is_minikube:
-                print(f"  ├─ {bridge.name} ({bridge.subnet}) [Minikube]")
+                parts = [f"  ├─ {bridge.name} ({bridge.subnet}) [Minikube]"]
+            elif internal_comm:
+                parts = [f"  ├─ {bridge.name} ({bridge.subnet}) ✓子网内通信",
+                         f"  │   ├─> {bridge.name} (子网内通信)"]
             else:
-                status = " ✓子网内通信" if internal_comm else ""
-                print(f"  ├─ {bridge.name} ({bridge.subnet}){status}")
-            
-            if not is_minikube and internal_comm:
-                print(f"  │   ├─> {bridge.name} (子网内通信)")
-            
-            print(f"  │   ├─> {physical_if} (外网)")
-            
-            if minikube_info and bridge.name != minikube_info.bridge_name:
-                print(f"  │   ├─> {minikube_info.bridge_name} (Minikube)")
+                parts = [f"  ├─ {bridge.name} ({bridge.subnet})"]
             
-            if self.info_provider._interface_exists('tun0'):
-                print("  │   └─> tun0 (宿主机)")
+            parts.append(physical_line)
+            if minikube_line and not is_minikube:
+                parts.append(minikube_line)
+            if tun0_line:
+                parts.append(tun0_line)
+            lines.append('\n'.join(parts))
         
-        print()
+        lines.append("")
         
         if minikube_info and minikube_info.service_cidr:
-            print("🛣️  Minikube 路由:")
-            print(f"  └─ Service CIDR: {minikube_info.service_cidr} via {minikube_info.container_ip}\n")
-        
-        if Config.DNS_CONF_FILE.exists():
-            print("🌐 DNS 配置:")
-            with open(Config.DNS_CONF_FILE, 'r') as f:
-                content = f.read()
-                dns_match = re.search(r'^DNS=(.+)$', content, re.MULTILINE)
-                domains_match = re.search(r'^Domains=(.+)$', content, re.MULTILINE)
-                
-                if dns_match:
-                    print(f"  ├─ DNS 服务器: {dns_match.group(1)}")
-                if domains_match:
-                    print(f"  └─ 搜索域: {domains_match.group(1)}")
-            print()
-        
-        print("┌─────────────────────────────────────────────────────────────┐")
-        print("│                    转发规则统计                              │")
-        print("└─────────────────────────────────────────────────────────────┘\n")
+            lines.append("🛣️  Minikube 路由:")
+            lines.append(f"  └─ Service CIDR: {minikube_info.service_cidr} via {minikube_info.container_ip}\n")
         
-        forward_rules = IptablesManager.list_rules('filter', 'FORWARD')
-        nat_rules = IptablesManager.list_rules('nat', 'POSTROUTING')
-        
-        result = CommandExecutor.run(['ip', 'route'])
-        route_count = len([line for line in result.stdout.split('\n') if 'via' in line])
-        
-        print(f"📊 FORWARD 规则数: {len(forward_rules)}")
-        print(f"📊 NAT 规则数: {len(nat_rules)}")
-        print(f"📊 路由条目数: {route_count}\n")
+        try:
+            with open(_DNS_PATH, 'rb') as f:
+                content = f.read().decode()
+        except OSError:
+            content = None
+        
+        if content is not None:
+            lines.append("🌐 DNS 配置:")
+            # 单次扫描同时提取 DNS 与 Domains（各取首次出现的值）
+            settings: Dict[str, str] = {}
+            for match in _DNS_CONF_RE.finditer(content):
+                settings.setdefault(match.group(1), match.group(2))
+            
+            if 'DNS' in settings:
+                lines.append(f"  ├─ DNS 服务器: {settings['DNS']}")
+            if 'Domains' in settings:
+                lines.append(f"  └─ 搜索域: {settings['Domains']}")
+            lines.append("")
+        
+        lines.append("┌─────────────────────────────────────────────────────────────┐")
+        lines.append("│                    转发规则统计                              │")
+        lines.append("└─────────────────────────────────────────────────────────────┘\n")
+        
+        forward_rules = IptablesManager.list_rules('filter', 'FORWARD', snapshot)
+        nat_rules = IptablesManager.list_rules('nat', 'POSTROUTING', snapshot)
+        route_count = sum(1 for line in route_result.stdout.splitlines() if b'via' in line)
+        
+        lines.append(f"📊 FORWARD 规则数: {len(forward_rules)}")
+        lines.append(f"📊 NAT 规则数: {len(nat_rules)}")
+        lines.append(f"📊 路由条目数: {route_count}\n")
+        
+        sys.stdout.write('\n'.join(lines) + '\n')
+        sys.stdout.flush()
 
 # ==================== 主程序 ====================
 
 class DockerNetworkSetup:
     """Docker 网络配置主程序"""
     
-    def __init__(self, verbose: bool = False):
+    def __init__(self, verbose: bool = False, prefetch: bool = True, use_cache: bool = True,
+                 topology: bool = False):
         self.verbose = verbose
-        self._network_cache = self._collect_network_info()
+        self.topology = topology
+        self.prefetch = prefetch
+        self.use_cache = use_cache
+        self._network_cache = self._load_network_cache() or self._collect_network_info()
         self.configurator = NetworkConfigurator(self._network_cache)
         self.topology_generator = TopologyGenerator()
     
     def _collect_network_info(self) -> Dict:
-        """一次性收集所有网络信息并缓存"""
+        """一次性收集所有网络信息并缓存（各探测默认并发执行，集群 DNS 待 Minikube 确认后查询）"""
         Logger.debug("正在收集网络信息...")
         info_provider = NetworkInfoProvider()
-        
-        cache = {
-            'physical_if': info_provider.get_physical_interface(),
-            'bridges': info_provider.get_docker_bridges(),
-            'minikube_info': info_provider.get_minikube_info()
+        probes = {
+            'physical_if': info_provider.get_physical_interface,
+            'bridges': info_provider.get_docker_bridges,
+            'minikube_info': info_provider.get_minikube_info
         }
         
+        def dns_probe(minikube_info: Optional[MinikubeInfo]) -> Optional[str]:
+            """未检测到 Minikube 时不加载 kubeconfig、不访问集群"""
+            return info_provider.get_minikube_dns_ip() if minikube_info else None
+        
+        if self.prefetch:
+            with ThreadPoolExecutor(max_workers=len(probes) + 1) as executor:
+                futures = {key: executor.submit(probe) for key, probe in probes.items()}
+                minikube_future = futures['minikube_info']
+                futures['dns_ip'] = executor.submit(lambda: dns_probe(minikube_future.result()))
+                cache = {key: future.result() for key, future in futures.items()}
+        else:
+            cache = {key: probe() for key, probe in probes.items()}
+            cache['dns_ip'] = dns_probe(cache['minikube_info'])
+        
         Logger.debug(f"网络信息收集完成: {len(cache['bridges'])} 个网桥")
+        self._save_network_cache(cache)
+        return cache
+    
+    @staticmethod
+    def _network_cache_path() -> Optional[Path]:
+        """网络信息缓存文件路径（位于用户运行时目录，不存在则不缓存）"""
+        runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or f"/run/user/{os.getuid()}"
+        if not os.path.isdir(runtime_dir):
+            return None
+        return Path(runtime_dir) / Config.NETWORK_CACHE_NAME
+    
+    @staticmethod
+    def _interfaces_key() -> List[str]:
+        """当前网络接口列表（接口增删即视为缓存失效）"""
+        try:
+            return sorted(os.listdir('/sys/class/net'))
+        except OSError:
+            return []
+    
+    def _load_network_cache(self) -> Optional[Dict]:
+        """读取未过期且接口列表未变化的网络信息缓存"""
+        path = self._network_cache_path() if self.use_cache else None
+        if path is None:
+            return None
+        
+        try:
+            with open(path, 'r') as f:
+                stored = json.load(f)
+            if (time.time() - stored['created'] > Config.NETWORK_CACHE_TTL
+                    or stored['interfaces'] != self._interfaces_key()):
+                return None
+            data = stored['data']
+            cache = {
+                'physical_if': data['physical_if'],
+                'bridges': [BridgeInfo(**bridge) for bridge in data['bridges']],
+                'minikube_info': MinikubeInfo(**data['minikube_info']) if data['minikube_info'] else None,
+                'dns_ip': data['dns_ip']
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        
+        Logger.debug(f"使用网络信息缓存: {path}")
         return cache
     
+    def _save_network_cache(self, cache: Dict):
+        """写入网络信息缓存（失败时忽略）"""
+        path = self._network_cache_path()
+        if path is None:
+            return
+        
+        stored = {
+            'created': time.time(),
+            'interfaces': self._interfaces_key(),
+            'data': {
+                'physical_if': cache['physical_if'],
+                'bridges': [asdict(bridge) for bridge in cache['bridges']],
+                'minikube_info': asdict(cache['minikube_info']) if cache['minikube_info'] else None,
+                'dns_ip': cache['dns_ip']
+            }
+        }
+        tmp_path = path.with_name(path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            Logger.debug(f"写入网络信息缓存失败: {e}")
+    
     def run(self):
         """运行配置"""
         Logger.section("Lima Docker 虚拟机网络配置脚本")
@@ -931,23 +1466,22 @@ class DockerNetworkSetup:
         self._enable_ip_forward()
         
         # 执行配置
-        self.configurator.configure_docker_bridges_nat()
-        self.configurator.configure_tun0_to_bridges()
-        self.configurator.configure_minikube_routes()
-        self.configurator.configure_minikube_dns()
-        self.configurator.configure_bridges_to_minikube()
-        self.configurator.configure_bridge_internal_communication()
-        
-        self.configurator.cleanup_invalid_rules()
+        self.configurator.configure_all()
+        
+        snapshot = self.configurator.cleanup_invalid_rules()
         print()
         
-        self.topology_generator.generate()
+        # 拓扑图需额外检查每个网桥，仅在显式要求时生成
+        if self.verbose or self.topology:
+            self.topology_generator.generate()
+        else:
+            self._show_summary(snapshot)
         
         if self.verbose:
             self._show_detailed_rules()
         
         Logger.section("✅ 网络配置完成！")
-        Logger.info(f"提示: 使用 '{sys.argv[0]} -v' 查看详细规则列表")
+        Logger.info(f"提示: 使用 '{sys.argv[0]} --topology' 查看网络拓扑图，'-v' 查看详细规则列表")
     
     def _check_commands(self):
         """检查必要命令"""
@@ -958,35 +1492,55 @@ class DockerNetworkSetup:
     
     def _check_permissions(self):
         """检查权限"""
-        if os.geteuid() != 0:
-            result = subprocess.run(['sudo', '-n', 'true'], capture_output=True)
-            if result.returncode != 0:
-                Logger.error("此脚本需要 root 权限或 sudo 权限")
-                sys.exit(1)
+        if os.geteuid() == 0:
+            return
+        try:
+            sudo_ok = subprocess.run(['sudo', '-n', 'true'], capture_output=True).returncode == 0
+        except OSError:
+            sudo_ok = False
+        if not sudo_ok:
+            Logger.error("此脚本需要 root 权限或 sudo 权限")
+            sys.exit(1)
     
     def _enable_ip_forward(self):
-        """启用 IP 转发"""
-        result = CommandExecutor.run(['sysctl', '-n', 'net.ipv4.ip_forward'])
-        if result.stdout.strip() != '1':
+        """启用 IP 转发（直接读取 /proc，仅写入时调用 sysctl）"""
+        try:
+            enabled = Config.IP_FORWARD_PATH.read_text().strip() == '1'
+        except OSError:
+            enabled = False
+        if not enabled:
             Logger.info("启用 IP 转发...")
             CommandExecutor.run_sudo(['sysctl', '-w', 'net.ipv4.ip_forward=1'], capture_output=False)
             Logger.info("✅ IP 转发已启用\n")
     
+    def _show_summary(self, snapshot: IptablesSnapshot):
+        """打印一行配置摘要（网桥数与规则数，复用清理检查的快照）"""
+        forward_count = len(snapshot.list_rules('filter', 'FORWARD'))
+        nat_count = len(snapshot.list_rules('nat', 'POSTROUTING'))
+        Logger.info(f"网桥: {len(self._network_cache['bridges'])} 个，"
+                    f"FORWARD 规则: {forward_count} 条，NAT 规则: {nat_count} 条")
+    
     def _show_detailed_rules(self):
         """显示详细规则"""
         Logger.section("详细规则列表")
         
-        print("\n🔍 FORWARD 链规则:")
-        CommandExecutor.run_sudo(['iptables', '-L', 'FORWARD', '-n', '-v', '--line-numbers'],
-                                capture_output=False)
+        sections = [
+            ("🔍 FORWARD 链规则:",
+             CommandExecutor.sudo_prefix(['iptables', '-L', 'FORWARD', '-n', '-v', '--line-numbers'])),
+            ("🔍 NAT POSTROUTING 链规则:",
+             CommandExecutor.sudo_prefix(['iptables', '-t', 'nat', '-L', 'POSTROUTING', '-n', '-v', '--line-numbers'])),
+            ("🔍 路由表:", ['ip', 'route'])
+        ]
+        results = asyncio.run(CommandExecutor.run_many_async([cmd for _, cmd in sections]))
         
-        print("\n🔍 NAT POSTROUTING 链规则:")
-        CommandExecutor.run_sudo(['iptables', '-t', 'nat', '-L', 'POSTROUTING', '-n', '-v', '--line-numbers'],
-                                capture_output=False)
+        lines: List[str] = []
+        for (title, _), result in zip(sections, results):
+            lines.append(f"\n{title}")
+            lines.append((result.stdout + result.stderr).decode(errors='replace').rstrip('\n'))
+        lines.append("")
         
-        print("\n🔍 路由表:")
-        CommandExecutor.run(['ip', 'route'], capture_output=False)
-        print()
+        sys.stdout.write('\n'.join(lines) + '\n')
+        sys.stdout.flush()
 
 def main():
     """主函数"""
@@ -998,16 +1552,28 @@ def main():
     )
     parser.add_argument('-v', '--verbose', action='store_true',
                        help='显示详细规则列表')
+    parser.add_argument('--no-prefetch', action='store_true',
+                       help='串行收集网络信息（不并发预取）')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='忽略网络信息缓存，强制重新收集')
+    parser.add_argument('--topology', action='store_true',
+                       help='显示网络拓扑图（-v 时默认显示）')
     
     args = parser.parse_args()
     
     try:
-        setup = DockerNetworkSetup(verbose=args.verbose)
+        setup = DockerNetworkSetup(verbose=args.verbose, prefetch=not args.no_prefetch,
+                                   use_cache=not args.no_cache, topology=args.topology)
         setup.run()
     except KeyboardInterrupt:
         print()
         Logger.warn("用户中断操作")
         sys.exit(130)
+    except BrokenPipeError:
+        # 输出被管道截断（如 | head）：将 stdout 指向 devnull，避免退出时刷新缓冲再次报错
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(141)
     except Exception as e:
         Logger.error(f"执行失败: {e}")
         if args.verbose: